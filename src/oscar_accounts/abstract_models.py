@@ -1,36 +1,95 @@
-import hashlib
-import hmac
+import uuid
 from decimal import Decimal as D
 
-from django.conf import settings
 from django.db import models, transaction
-from django.db.models import Sum
+from django.db.models import (
+    Case, Count, F, OuterRef, Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from oscar.core.compat import AUTH_USER_MODEL
 from treebeard.mp_tree import MP_Node
 
-from oscar_accounts import exceptions
+from oscar_accounts import balances, exceptions, signals
+from oscar_accounts.fields import EndDateTimeField, StartDateTimeField
 
 
-class ActiveAccountManager(models.Manager):
+class AccountQuerySet(models.QuerySet):
+
+    def active(self, now=None):
+        """
+        Filter to accounts within their date range
+
+        :now: The time to test against (defaults to the current time)
+        """
+        if now is None:
+            now = timezone.now()
+        # Open-ended dates are stored as sentinels so no NULL checks are needed
+        return self.filter(start_date__lte=now, end_date__gte=now)
+
+    def expired(self, now=None):
+        """
+        Filter to accounts whose end date has passed
+
+        :now: The time to test against (defaults to the current time)
+        """
+        if now is None:
+            now = timezone.now()
+        return self.filter(end_date__lt=now)
+
+    def annotate_is_active(self, now=None):
+        """
+        Annotate each account with whether it is within its date range (as
+        per Account.is_active) as 'is_active_now'.
+
+        This lets the check be combined with other filters in SQL rather than
+        testing each account in Python.
+        """
+        if now is None:
+            now = timezone.now()
+        # The end date is exclusive here, as in Account.is_active, whereas
+        # active() has always included accounts at the moment they end.
+        return self.annotate(is_active_now=Case(
+            When(start_date__lte=now, end_date__gt=now, then=Value(True)),
+            default=Value(False), output_field=models.BooleanField()))
+
+    def with_counts(self):
+        """
+        Annotate each account with the number of transactions against it.
+
+        Use this when listing accounts to avoid a COUNT query per account.
+        """
+        return self.annotate(transaction_count=Count('transactions'))
+
+    def recompute_balances(self):
+        """
+        Recalculate the cached balance of each account from its transactions.
+
+        This runs as a single UPDATE rather than saving each account in turn.
+        """
+        Transaction = self.model._meta.get_field('transactions').related_model
+        totals = Transaction.objects.filter(
+            account=OuterRef('pk')).order_by().values('account').annotate(
+                total=Sum('amount')).values('total')
+        num_updated = self.update(
+            balance=Coalesce(Subquery(totals), D('0.00')))
+        # The queryset may be filtered on the balances just changed, so rather
+        # than looking up which accounts were updated, invalidate them all.
+        transaction.on_commit(balances.invalidate_all)
+        return num_updated
+
+
+class ActiveAccountManager(models.Manager.from_queryset(AccountQuerySet)):
 
     def get_queryset(self):
-        now = timezone.now()
-        qs = super().get_queryset()
-        return qs.filter(
-            models.Q(start_date__lte=now) | models.Q(start_date=None)).filter(
-                models.Q(end_date__gte=now) | models.Q(end_date=None)
-        )
+        return super().get_queryset().active()
 
 
-class ExpiredAccountManager(models.Manager):
+class ExpiredAccountManager(models.Manager.from_queryset(AccountQuerySet)):
 
     def get_queryset(self):
-        now = timezone.now()
-        qs = super().get_queryset()
-        return qs.filter(end_date__lt=now)
+        return super().get_queryset().expired()
 
 
 class AccountType(MP_Node):
@@ -103,8 +162,11 @@ class Account(models.Model):
     # Accounts can have an date range to indicate when they are 'active'.  Note
     # that these dates are ignored when creating a transfer.  It is up to your
     # client code to use them to enforce business logic.
-    start_date = models.DateTimeField(null=True, blank=True)
-    end_date = models.DateTimeField(null=True, blank=True)
+    #
+    # Missing dates are stored as sentinel values rather than NULL so that the
+    # active and expired managers can use plain range lookups.
+    start_date = StartDateTimeField(blank=True)
+    end_date = EndDateTimeField(blank=True)
 
     # Accounts are sometimes restricted to only work on a specific range of
     # products.  This is the only link with Oscar.
@@ -119,13 +181,21 @@ class Account(models.Model):
 
     date_created = models.DateTimeField(auto_now_add=True)
 
-    objects = models.Manager()
+    objects = AccountQuerySet.as_manager()
     active = ActiveAccountManager()
     expired = ExpiredAccountManager()
 
     class Meta:
         abstract = True
         app_label = 'oscar_accounts'
+        # Support the date range lookups made by the active and expired
+        # managers.
+        indexes = [
+            models.Index(fields=['start_date', 'end_date'],
+                         name='oscar_accounts_account_dates'),
+            models.Index(fields=['end_date'],
+                         name='oscar_accounts_account_end'),
+        ]
 
     def __str__(self):
         if self.code:
@@ -134,22 +204,36 @@ class Account(models.Model):
             return self.name
         return 'Anonymous'
 
-    def is_active(self):
+    def is_active(self, now=None):
+        """
+        Test whether the account is within its date range
+
+        :now: The time to test against.  Pass this in when checking many
+              accounts to share a single timestamp between them.
+        """
         if self.start_date is None and self.end_date is None:
             return True
-        now = timezone.now()
-        if self.start_date and self.end_date is None:
-            return now >= self.start_date
-        if self.start_date is None and self.end_date:
-            return now < self.end_date
-        return self.start_date <= now < self.end_date
+        if now is None:
+            now = timezone.now()
+        started = self.start_date is None or self.start_date <= now
+        ended = self.end_date is not None and now >= self.end_date
+        return started and not ended
 
     def save(self, *args, **kwargs):
         if self.code:
             self.code = self.code.upper()
-        # Ensure the balance is always correct when saving
-        self.balance = self._balance()
-        return super().save(*args, **kwargs)
+        # Ensure the balance is always correct when saving.  Partial saves that
+        # don't touch the balance skip the (potentially expensive) aggregate.
+        update_fields = kwargs.get('update_fields')
+        update_balance = update_fields is None or 'balance' in update_fields
+        if update_balance:
+            self.balance = self._balance()
+        is_new = self.pk is None
+        super().save(*args, **kwargs)
+        # Only invalidate once the new balance has been written, as outside
+        # of an atomic block on_commit runs the callback immediately.
+        if update_balance and not is_new:
+            transaction.on_commit(lambda: balances.invalidate(self.pk))
 
     def _balance(self):
         aggregates = self.transactions.aggregate(sum=Sum('amount'))
@@ -157,6 +241,9 @@ class Account(models.Model):
         return D('0.00') if sum is None else sum
 
     def num_transactions(self):
+        # Use the count annotated by AccountQuerySet.with_counts if available
+        if hasattr(self, 'transaction_count'):
+            return self.transaction_count
         return self.transactions.all().count()
 
     @property
@@ -167,9 +254,11 @@ class Account(models.Model):
         """
         Test if the a debit for the passed amount is permitted
         """
-        if self.amount_available is None:
+        # Work out the available amount once as it involves Decimal arithmetic
+        available = self.amount_available
+        if available is None:
             return True
-        return amount <= self.amount_available
+        return amount <= available
 
     @property
     def amount_available(self):
@@ -272,35 +361,163 @@ class PostingManager(models.Manager):
     Apparently, finance people refer to "posting a transaction"; hence why this
     """
 
+    # The account fields read when verifying and posting a transfer
+    verification_fields = ('status', 'credit_limit', 'balance', 'primary_user')
+
     def create(self, source, destination, amount, parent=None,
                user=None, merchant_reference=None, description=None):
+        self._check_distinct(source.pk, destination.pk)
         # Write out transfer (which involves multiple writes).  We use a
         # database transaction to ensure that all get written out correctly.
-        self.verify_transfer(source, destination, amount, user)
         with transaction.atomic():
-            transfer = self.get_queryset().create(
-                source=source,
-                destination=destination,
-                amount=amount,
-                parent=parent,
-                user=user,
-                merchant_reference=merchant_reference,
-                description=description)
-            # Create transaction records for audit trail
-            transfer.transactions.create(
-                account=source, amount=-amount)
-            transfer.transactions.create(
-                account=destination, amount=amount)
-            # Update the cached balances on the accounts
-            source.save()
-            destination.save()
-            return self._wrap(transfer)
+            # Lock both accounts before verifying the transfer so that
+            # concurrent transfers can't act on stale balances.
+            self._lock_accounts(source, destination)
+            return self._post(source, destination, amount, parent, user,
+                              merchant_reference, description)
+
+    def create_trusted(self, source, destination, amount, parent=None,
+                       user=None, merchant_reference=None, description=None):
+        """
+        Create a transfer for an amount that is already known to be valid,
+        such as one taken from an existing transfer.
+
+        This skips the positive amount check but still verifies the accounts.
+        Databases that enforce check constraints reject non-positive amounts
+        regardless, but MySQL before 8.0.16 doesn't, so only pass amounts
+        that really are trusted.
+        """
+        self._check_distinct(source.pk, destination.pk)
+        with transaction.atomic():
+            self._lock_accounts(source, destination)
+            return self._post(source, destination, amount, parent, user,
+                              merchant_reference, description, trusted=True)
+
+    def create_by_id(self, source_id, destination_id, amount, parent=None,
+                     user=None, merchant_reference=None, description=None):
+        """
+        Create a transfer between the accounts with the passed IDs.
+
+        The accounts are locked and only the fields needed to verify the
+        transfer are loaded, all in a single query.  Use this when you don't
+        already have the account instances to hand.
+        """
+        Account = self._account_model()
+        # IDs may be passed as strings (eg from URL kwargs)
+        source_id = Account._meta.pk.to_python(source_id)
+        destination_id = Account._meta.pk.to_python(destination_id)
+        self._check_distinct(source_id, destination_id)
+        with transaction.atomic():
+            accounts = self._select_locked(
+                [source_id, destination_id], self.verification_fields)
+            accounts = {account.pk: account for account in accounts}
+            try:
+                source = accounts[source_id]
+                destination = accounts[destination_id]
+            except KeyError:
+                raise Account.DoesNotExist(
+                    "Unable to find accounts #%s and #%s" % (
+                        source_id, destination_id))
+            return self._post(source, destination, amount, parent, user,
+                              merchant_reference, description)
+
+    def _post(self, source, destination, amount, parent, user,
+              merchant_reference, description, trusted=False):
+        # Write out the transfer for accounts that have already been locked
+        # within the current database transaction.
+        if trusted:
+            self._verify_accounts(source, destination, amount, user)
+        else:
+            self.verify_transfer(source, destination, amount, user)
+        self._update_balances(source, destination, amount)
+        transfer = self.get_queryset().create(
+            source=source,
+            destination=destination,
+            amount=amount,
+            parent=parent,
+            user=user,
+            merchant_reference=merchant_reference,
+            description=description)
+        # Create transaction records for audit trail.  Both rows are written
+        # in a single INSERT.
+        Transaction = transfer.transactions.model
+        Transaction.objects.bulk_create([
+            Transaction(transfer=transfer, account=source, amount=-amount),
+            Transaction(transfer=transfer, account=destination, amount=amount),
+        ])
+        # Anything else only needs to happen once the transfer is committed,
+        # after the account locks have been released.
+        transaction.on_commit(lambda: signals.transfer_posted.send(
+            sender=self.model, transfer=transfer))
+        return self._wrap(transfer)
+
+    def _update_balances(self, source, destination, amount):
+        # Update the cached balances on the accounts.  We apply the known
+        # delta to both accounts in a single UPDATE rather than
+        # re-aggregating every transaction for each account.  The debit is
+        # guarded within the same statement so it only applies while the
+        # source is open and has the funds available.
+        Account = source.__class__
+        has_funds = models.Q(credit_limit=None) | models.Q(
+            balance__gte=amount - F('credit_limit'))
+        debit_permitted = models.Q(pk=source.pk, status=Account.OPEN) & has_funds
+        num_updated = Account.objects.filter(
+            models.Q(pk=destination.pk) | debit_permitted).update(
+                balance=Case(
+                    When(pk=source.pk, then=F('balance') - amount),
+                    default=F('balance') + amount))
+        if num_updated != 2:
+            if not Account.objects.filter(
+                    pk=source.pk, status=Account.OPEN).exists():
+                raise exceptions.ClosedAccount(
+                    "Source account has been closed")
+            msg = "Unable to debit %.2f from account #%d:"
+            raise exceptions.InsufficientFunds(msg % (amount, source.id))
+        # The rows are locked so the new balances can be worked out without
+        # reading them back.
+        source.balance -= amount
+        destination.balance += amount
 
     def _wrap(self, obj):
         # Dumb method that is here only so that it can be mocked to test the
         # transaction behaviour.
         return obj
 
+    def _check_distinct(self, source_id, destination_id):
+        # Checked before locking as a transfer from an account to itself
+        # would otherwise fail confusingly once the balances are updated.
+        if source_id == destination_id:
+            raise exceptions.AccountException(
+                "The source and destination accounts for a transfer "
+                "must be different.")
+
+    def _account_model(self):
+        return self.model._meta.get_field('source').related_model
+
+    def _select_locked(self, account_ids, fields):
+        """
+        Return the accounts with the passed IDs, loading only the passed
+        fields and locking them until the end of the current database
+        transaction.
+        """
+        # Rows are locked in primary key order to avoid deadlocks between
+        # concurrent transfers going in opposite directions.
+        return self._account_model().objects.select_for_update().only(
+            *fields).filter(pk__in=account_ids).order_by('pk')
+
+    def _lock_accounts(self, *accounts):
+        """
+        Lock the passed accounts until the end of the current database
+        transaction and refresh the fields used to verify a transfer.
+        """
+        fields = ('status', 'credit_limit', 'balance')
+        current = {
+            account.pk: account for account in self._select_locked(
+                [account.pk for account in accounts], fields)}
+        for account in accounts:
+            for field in fields:
+                setattr(account, field, getattr(current[account.pk], field))
+
     def verify_transfer(self, source, destination, amount, user=None):
         """
         Test whether the proposed transaction is permitted.  Raise an exception
@@ -308,6 +525,10 @@ class PostingManager(models.Manager):
         """
         if amount <= 0:
             raise exceptions.InvalidAmount("Debits must use a positive amount")
+        self._verify_accounts(source, destination, amount, user)
+
+    def _verify_accounts(self, source, destination, amount, user=None):
+        # The checks from verify_transfer that depend on the accounts
         if not source.is_open():
             raise exceptions.ClosedAccount("Source account has been closed")
         if not source.can_be_authorised_by(user):
@@ -369,6 +590,16 @@ class Transfer(models.Model):
         abstract = True
         ordering = ('-date_created',)
         app_label = 'oscar_accounts'
+        # Support listing transfers and reporting over a date range
+        indexes = [
+            models.Index(fields=['date_created'],
+                         name='oscar_accounts_transfer_date'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(amount__gt=0),
+                name='oscar_accounts_transfer_amount_positive'),
+        ]
 
     def delete(self, *args, **kwargs):
         raise RuntimeError("Transfers cannot be deleted")
@@ -377,18 +608,14 @@ class Transfer(models.Model):
         # Store audit information about authorising user (if one is set)
         if self.user:
             self.username = self.user.get_username()
-        # We generate a transaction reference using the PK of the transfer so
-        # we save the transfer first
-        super().save(*args, **kwargs)
+        # The reference is generated independently of the PK so it can be
+        # written out with the initial INSERT
         if not self.reference:
             self.reference = self._generate_reference()
-            super().save(update_fields=['reference'])
+        super().save(*args, **kwargs)
 
     def _generate_reference(self):
-        obj = hmac.new(key=settings.SECRET_KEY.encode(),
-                       msg=str(self.id).encode(),
-                       digestmod=hashlib.md5)
-        return obj.hexdigest().upper()
+        return uuid.uuid4().hex.upper()
 
     @property
     def authorisor_username(self):
@@ -449,6 +676,18 @@ class Transaction(models.Model):
         app_label = 'oscar_accounts'
         unique_together = ('transfer', 'account')
         abstract = True
+        # Bound per-account scans (eg balances as at a given date) to the
+        # relevant date range
+        indexes = [
+            models.Index(fields=['account', 'date_created'],
+                         name='oscar_accounts_txn_acct_date'),
+        ]
+        # Credits are positive and debits negative, but never zero
+        constraints = [
+            models.CheckConstraint(
+                check=~models.Q(amount=0),
+                name='oscar_accounts_transaction_amount_nonzero'),
+        ]
 
     def delete(self, *args, **kwargs):
         raise RuntimeError("Transactions cannot be deleted")
@@ -15,16 +15,25 @@ class AccountAdmin(admin.ModelAdmin):
                     'date_created']
     readonly_fields = ('balance', 'code',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate_is_active()
+
+    def is_active(self, obj):
+        return obj.is_active_now
+    is_active.boolean = True
+
 
 class TransferAdmin(admin.ModelAdmin):
     list_display = ['reference', 'amount', 'source', 'destination',
                     'user', 'description', 'date_created']
+    list_select_related = ('source', 'destination', 'user')
     readonly_fields = ('amount', 'source', 'destination', 'description',
                        'user', 'username', 'date_created')
 
 
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['id', 'transfer', 'account', 'amount', 'date_created']
+    list_select_related = ('transfer', 'account')
     readonly_fields = ('transfer', 'account', 'amount', 'date_created')
 
 
@@ -188,7 +188,7 @@ class AccountView(JSONView):
     Fetch details of an account
     """
     def get(self, request, *args, **kwargs):
-        account = get_object_or_404(Account, code=kwargs['code'])
+        account = get_object_or_404(Account, code=kwargs['code'].upper())
         return self.ok(account.as_dict())
 
 
@@ -209,7 +209,7 @@ class AccountRedemptionsView(JSONView):
         """
         Redeem an amount from the selected giftcard
         """
-        account = get_object_or_404(Account, code=self.kwargs['code'])
+        account = get_object_or_404(Account, code=self.kwargs['code'].upper())
         if not account.is_active():
             raise ValidationError(errors.ACCOUNT_INACTIVE)
         amt = payload['amount']
@@ -244,7 +244,7 @@ class AccountRefundsView(JSONView):
         return amount
 
     def valid_payload(self, payload):
-        account = get_object_or_404(Account, code=self.kwargs['code'])
+        account = get_object_or_404(Account, code=self.kwargs['code'].upper())
         if not account.is_active():
             raise ValidationError(errors.ACCOUNT_INACTIVE)
         redemptions = Account.objects.get(name=names.REDEMPTIONS)
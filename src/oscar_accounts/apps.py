@@ -7,3 +7,6 @@ class AccountsConfig(OscarConfig):
     name = 'oscar_accounts'
     verbose_name = _('Accounts')
     namespace = 'oscar_accounts'
+
+    def ready(self):
+        from oscar_accounts import receivers  # noqa
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from oscar.core.loading import get_model
+
+CACHE_KEY = 'oscar_accounts:balance:%s:%s:%s'
+VERSION_KEY = 'oscar_accounts:balance-version:%s'
+# Bumped to invalidate every cached balance at once
+GLOBAL_VERSION_KEY = 'oscar_accounts:balance-version'
+
+# How long (in seconds) a cached balance is kept for.  Balances are
+# invalidated when they change so this is just an upper bound.
+CACHE_TIMEOUT = getattr(settings, 'ACCOUNTS_BALANCE_CACHE_TIMEOUT', 300)
+
+
+def get_balance(account_id):
+    """
+    Return the balance of the account with the passed ID, reading it from the
+    cache where possible.
+
+    This is intended for displaying balances.  Don't use it to decide whether
+    a debit is permitted - the posting manager always works from the database.
+    """
+    # The versions are read before the database so that, if the balance
+    # changes in between, the stale value is cached under a version nothing
+    # reads.
+    version_keys = [GLOBAL_VERSION_KEY, VERSION_KEY % account_id]
+    versions = _get_versions(version_keys)
+    key = CACHE_KEY % (account_id, *(versions[k] for k in version_keys))
+    balance = cache.get(key)
+    if balance is None:
+        Account = get_model('oscar_accounts', 'Account')
+        balance = Account.objects.values_list(
+            'balance', flat=True).get(pk=account_id)
+        cache.set(key, balance, CACHE_TIMEOUT)
+    return balance
+
+
+def invalidate(*account_ids):
+    """
+    Invalidate the cached balances of the accounts with the passed IDs
+    """
+    for account_id in account_ids:
+        _incr(VERSION_KEY % account_id)
+
+
+def invalidate_all():
+    """
+    Invalidate the cached balances of all accounts
+    """
+    _incr(GLOBAL_VERSION_KEY)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version means nothing has been cached under it
+        pass
+
+
+def _get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Start from the current time so a version that has been evicted
+        # isn't reused
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return versions
@@ -24,6 +24,10 @@ class SearchForm(forms.Form):
         (Account.CLOSED, _("Closed")))
     status = forms.ChoiceField(choices=STATUS_CHOICES, required=False)
 
+    def clean_code(self):
+        # Codes are stored in uppercase so we match that for an exact lookup
+        return self.cleaned_data['code'].strip().upper()
+
 
 class TransferSearchForm(forms.Form):
     reference = forms.CharField(required=False)
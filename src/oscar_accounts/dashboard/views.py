@@ -39,7 +39,7 @@ class AccountListView(generic.ListView):
         return ctx
 
     def get_queryset(self):
-        queryset = Account.objects.all()
+        queryset = Account.objects.with_counts()
 
         if 'code' not in self.request.GET:
             # Form not submitted
@@ -206,7 +206,8 @@ class AccountTransactionsView(generic.ListView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return self.account.transactions.all().order_by('-date_created')
+        return self.account.transactions.select_related(
+            'transfer', 'transfer__user').order_by('-date_created')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -229,7 +230,8 @@ class TransferListView(generic.ListView):
         return ctx
 
     def get_queryset(self):
-        queryset = self.model.objects.all()
+        queryset = self.model.objects.select_related(
+            'source', 'destination', 'user')
 
         if 'reference' not in self.request.GET:
             # Form not submitted
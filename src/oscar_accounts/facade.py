@@ -86,7 +86,9 @@ def reverse(transfer, user=None, merchant_reference=None, description=None):
     if description:
         msg += " '%s'" % description
     try:
-        transfer = Transfer.objects.create(
+        # The amount comes from an existing transfer so it is known to be
+        # valid
+        transfer = Transfer.objects.create_trusted(
             source=transfer.destination,
             destination=transfer.source,
             amount=transfer.amount, user=user,
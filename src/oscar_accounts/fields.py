@@ -0,0 +1,45 @@
+import datetime
+
+from django.conf import settings
+from django.db import models
+
+
+class BoundaryDateTimeField(models.DateTimeField):
+    """
+    A datetime field for one end of a date range, where a missing value means
+    the range is unbounded at that end.
+
+    Missing values are stored as a sentinel datetime rather than as NULL so
+    that range filters don't need an ``OR ... IS NULL`` branch and can use an
+    index.  The sentinel is converted back to None when loaded, so Python code
+    still sees None.  Filtering on ``=None`` still matches unbounded values, as
+    None is converted to the sentinel, but ``__isnull`` no longer does.
+    """
+    # The value stored in place of NULL (made aware when USE_TZ is set)
+    sentinel = None
+
+    def get_sentinel(self):
+        if settings.USE_TZ:
+            return self.sentinel.replace(tzinfo=datetime.timezone.utc)
+        return self.sentinel
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return self.get_sentinel()
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if value == self.get_sentinel():
+            return None
+        return value
+
+
+class StartDateTimeField(BoundaryDateTimeField):
+    # Earlier than any real date but within the range of all supported
+    # databases
+    sentinel = datetime.datetime(1900, 1, 1)
+
+
+class EndDateTimeField(BoundaryDateTimeField):
+    sentinel = datetime.datetime(9999, 12, 31)
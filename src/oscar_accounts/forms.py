@@ -9,7 +9,8 @@ class AccountForm(forms.Form):
     code = forms.CharField(label=_("Account code"))
 
     def clean_code(self):
-        code = self.cleaned_data['code'].strip()
+        # Codes are stored in uppercase
+        code = self.cleaned_data['code'].strip().upper()
         try:
             self.account = Account.objects.get(
                 code=code)
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-15 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oscar_accounts', '0004_auto_20201109_1647'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['start_date', 'end_date'], name='oscar_accounts_account_dates'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['end_date'], name='oscar_accounts_account_end'),
+        ),
+    ]
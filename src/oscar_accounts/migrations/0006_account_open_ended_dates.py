@@ -0,0 +1,42 @@
+from django.db import migrations
+
+import oscar_accounts.fields
+
+
+def fill_open_ended_dates(apps, schema_editor):
+    Account = apps.get_model('oscar_accounts', 'Account')
+    Account.objects.filter(start_date=None).update(
+        start_date=oscar_accounts.fields.StartDateTimeField().get_sentinel())
+    Account.objects.filter(end_date=None).update(
+        end_date=oscar_accounts.fields.EndDateTimeField().get_sentinel())
+
+
+def clear_open_ended_dates(apps, schema_editor):
+    Account = apps.get_model('oscar_accounts', 'Account')
+    Account.objects.filter(
+        start_date=oscar_accounts.fields.StartDateTimeField().get_sentinel()
+    ).update(start_date=None)
+    Account.objects.filter(
+        end_date=oscar_accounts.fields.EndDateTimeField().get_sentinel()
+    ).update(end_date=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oscar_accounts', '0005_account_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_open_ended_dates, clear_open_ended_dates),
+        migrations.AlterField(
+            model_name='account',
+            name='start_date',
+            field=oscar_accounts.fields.StartDateTimeField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='end_date',
+            field=oscar_accounts.fields.EndDateTimeField(blank=True),
+        ),
+    ]
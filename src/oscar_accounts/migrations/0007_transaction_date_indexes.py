@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-15 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oscar_accounts', '0006_account_open_ended_dates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'date_created'], name='oscar_accounts_txn_acct_date'),
+        ),
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['date_created'], name='oscar_accounts_transfer_date'),
+        ),
+    ]
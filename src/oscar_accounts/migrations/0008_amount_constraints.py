@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-15 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oscar_accounts', '0007_transaction_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.CheckConstraint(check=models.Q(('amount', 0), _negated=True), name='oscar_accounts_transaction_amount_nonzero'),
+        ),
+        migrations.AddConstraint(
+            model_name='transfer',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gt', 0)), name='oscar_accounts_transfer_amount_positive'),
+        ),
+    ]
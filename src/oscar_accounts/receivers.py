@@ -0,0 +1,9 @@
+from django.dispatch import receiver
+
+from oscar_accounts import balances
+from oscar_accounts.signals import transfer_posted
+
+
+@receiver(transfer_posted, dispatch_uid='oscar_accounts_invalidate_balances')
+def invalidate_balances(sender, transfer, **kwargs):
+    balances.invalidate(transfer.source_id, transfer.destination_id)
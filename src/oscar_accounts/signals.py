@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent once the database transaction that posted a transfer has been
+# committed.  Receivers are passed the new transfer as 'transfer'.  Use this
+# for work that doesn't need to be atomic with the ledger (such as cache
+# invalidation or analytics) so it doesn't hold the account locks.
+transfer_posted = Signal()
@@ -165,6 +165,11 @@ class TestSuccessfullyCreatingAnAccount(test.TestCase):
     def test_detail_view_returns_refunds_url(self):
         self.assertTrue('refunds_url' in self.payload)
 
+    def test_detail_view_matches_codes_case_insensitively(self):
+        response = get(reverse('oscar_accounts_api:account',
+                               kwargs={'code': self.account.code.lower()}))
+        self.assertEqual(200, response.status_code)
+
 
 @freeze_time('2019-01-01')
 class TestMakingARedemption(test.TestCase):
@@ -4,7 +4,7 @@ from django.urls import reverse
 from oscar.test.factories import UserFactory
 
 from django_webtest import WebTest
-from oscar_accounts import models
+from oscar_accounts import facade, models, names
 from oscar_accounts.setup import create_default_accounts
 
 
@@ -28,3 +28,22 @@ class TestAStaffMember(WebTest):
 
         acc = models.Account.objects.get(name='Test account')
         self.assertEqual(D('120.00'), acc.balance)
+
+    def test_can_browse_transfers(self):
+        source = models.Account.objects.get(name=names.BANK)
+        destination = models.Account.objects.get(name=names.REDEMPTIONS)
+        for _ in range(2):
+            facade.transfer(source, destination, D('10.00'))
+        list_page = self.app.get(reverse('accounts_dashboard:transfers-list'), user=self.staff)
+        self.assertEqual(200, list_page.status_code)
+        self.assertEqual(2, len(list_page.context['transfers']))
+
+    def test_can_view_account_transactions(self):
+        source = models.Account.objects.get(name=names.BANK)
+        destination = models.Account.objects.get(name=names.REDEMPTIONS)
+        transfer = facade.transfer(source, destination, D('10.00'))
+        detail_page = self.app.get(
+            reverse('accounts_dashboard:accounts-detail', kwargs={'pk': destination.id}),
+            user=self.staff)
+        self.assertEqual(200, detail_page.status_code)
+        self.assertIn(transfer.reference, detail_page.text)
@@ -0,0 +1,72 @@
+from decimal import Decimal as D
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+
+from oscar_accounts import balances
+from oscar_accounts.models import Account, Transfer
+from oscar_accounts.test_factories import AccountFactory
+
+
+class TestACachedBalance(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.source = AccountFactory(primary_user=None, credit_limit=None)
+        self.destination = AccountFactory()
+
+    def test_is_read_from_the_database_on_first_access(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(D('0.00'), balances.get_balance(self.destination.id))
+
+    def test_is_served_from_the_cache_afterwards(self):
+        balances.get_balance(self.destination.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(D('0.00'), balances.get_balance(self.destination.id))
+
+    def test_is_invalidated_when_a_transfer_is_posted(self):
+        balances.get_balance(self.source.id)
+        balances.get_balance(self.destination.id)
+        Transfer.objects.create(self.source, self.destination, D('10.00'))
+        self.assertEqual(D('-10.00'), balances.get_balance(self.source.id))
+        self.assertEqual(D('10.00'), balances.get_balance(self.destination.id))
+
+    def test_is_invalidated_when_balances_are_recomputed(self):
+        Transfer.objects.create(self.source, self.destination, D('10.00'))
+        Account.objects.filter(id=self.destination.id).update(balance=D('0.00'))
+        balances.get_balance(self.destination.id)
+        Account.objects.recompute_balances()
+        self.assertEqual(D('10.00'), balances.get_balance(self.destination.id))
+
+    def test_is_invalidated_when_filtered_balances_are_recomputed(self):
+        Transfer.objects.create(self.source, self.destination, D('10.00'))
+        Account.objects.filter(id=self.destination.id).update(balance=D('99.00'))
+        balances.get_balance(self.destination.id)
+        Account.objects.filter(balance__gt=50).recompute_balances()
+        self.assertEqual(D('10.00'), balances.get_balance(self.destination.id))
+
+    def test_is_not_left_stale_by_a_transfer_posted_while_caching(self):
+        cache_set = cache.set
+
+        def post_then_set(*args, **kwargs):
+            Transfer.objects.create(self.source, self.destination, D('10.00'))
+            cache_set(*args, **kwargs)
+
+        with mock.patch.object(balances.cache, 'set', post_then_set):
+            balances.get_balance(self.destination.id)
+        self.assertEqual(D('10.00'), balances.get_balance(self.destination.id))
+
+    def test_is_not_left_stale_by_a_read_while_an_account_is_saved(self):
+        Transfer.objects.create(self.source, self.destination, D('10.00'))
+        Account.objects.filter(id=self.destination.id).update(balance=D('0.00'))
+        balances.get_balance(self.destination.id)
+        invalidate = balances.invalidate
+
+        def invalidate_then_read(*account_ids):
+            invalidate(*account_ids)
+            balances.get_balance(self.destination.id)
+
+        with mock.patch.object(balances, 'invalidate', invalidate_then_read):
+            self.destination.save()
+        self.assertEqual(D('10.00'), balances.get_balance(self.destination.id))
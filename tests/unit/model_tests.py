@@ -140,6 +140,105 @@ class TestAnUnlimitedCreditLimitAccount(TestCase):
             self.assertTrue(self.account.is_debit_permitted(amt))
 
 
+class TestAnAccountWithTransactions(TestCase):
+
+    def setUp(self):
+        self.account = AccountFactory()
+        TransactionFactory(account=self.account)
+        TransactionFactory(account=self.account)
+
+    def test_counts_its_transactions(self):
+        self.assertEqual(2, self.account.num_transactions())
+
+    def test_uses_the_annotated_count_when_available(self):
+        account = Account.objects.with_counts().get(id=self.account.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(2, account.num_transactions())
+
+
+class TestRecomputingBalances(TestCase):
+
+    def test_sets_each_balance_to_the_sum_of_its_transactions(self):
+        account = AccountFactory()
+        empty = AccountFactory()
+        TransactionFactory(account=account, amount=D('10.00'))
+        TransactionFactory(account=account, amount=D('2.50'))
+        Account.objects.filter(id__in=[account.id, empty.id]).update(balance=D('99.00'))
+
+        Account.objects.recompute_balances()
+
+        account.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual(D('12.50'), account.balance)
+        self.assertEqual(D('0.00'), empty.balance)
+
+    def test_updates_accounts_filtered_on_their_balance(self):
+        account = AccountFactory()
+        TransactionFactory(account=account, amount=D('10.00'))
+        Account.objects.filter(id=account.id).update(balance=D('99.00'))
+
+        self.assertEqual(1, Account.objects.filter(balance__gt=50).recompute_balances())
+
+        account.refresh_from_db()
+        self.assertEqual(D('10.00'), account.balance)
+
+    def test_updates_annotated_querysets(self):
+        account = AccountFactory()
+        TransactionFactory(account=account, amount=D('10.00'))
+        Account.objects.filter(id=account.id).update(balance=D('99.00'))
+
+        self.assertEqual(1, Account.objects.with_counts().filter(balance__gt=50).recompute_balances())
+
+        account.refresh_from_db()
+        self.assertEqual(D('10.00'), account.balance)
+
+
+class TestAnAccountWithADateRange(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.account = Account(start_date=self.now,
+                               end_date=self.now + datetime.timedelta(days=1))
+
+    def test_is_active_within_its_date_range(self):
+        self.assertTrue(self.account.is_active(self.now))
+
+    def test_is_inactive_before_its_start_date(self):
+        self.assertFalse(self.account.is_active(self.now - datetime.timedelta(seconds=1)))
+
+    def test_is_inactive_from_its_end_date(self):
+        self.assertFalse(self.account.is_active(self.account.end_date))
+
+    def test_is_active_when_open_ended(self):
+        self.account.end_date = None
+        self.assertTrue(self.account.is_active(self.now + datetime.timedelta(days=365)))
+
+
+class TestAnOpenEndedAccount(TestCase):
+
+    def setUp(self):
+        self.account = AccountFactory(start_date=None, end_date=None)
+
+    def test_does_not_store_null_dates(self):
+        self.assertFalse(Account.objects.filter(start_date__isnull=True).exists())
+        self.assertFalse(Account.objects.filter(end_date__isnull=True).exists())
+
+    def test_is_matched_by_filtering_on_none(self):
+        self.assertIn(self.account, Account.objects.filter(start_date=None))
+        self.assertIn(self.account, Account.objects.filter(end_date=None))
+
+    def test_loads_missing_dates_as_none(self):
+        account = Account.objects.get(id=self.account.id)
+        self.assertIsNone(account.start_date)
+        self.assertIsNone(account.end_date)
+
+    def test_is_included_by_the_active_manager(self):
+        self.assertIn(self.account, Account.active.all())
+
+    def test_is_not_included_by_the_expired_manager(self):
+        self.assertNotIn(self.account, Account.expired.all())
+
+
 class TestAccountExpiredManager(TestCase):
 
     def test_includes_only_expired_accounts(self):
@@ -160,6 +259,47 @@ class TestAccountActiveManager(TestCase):
         accounts = Account.active.all()
         self.assertTrue(expired not in accounts)
 
+    def test_can_filter_as_of_a_given_time(self):
+        now = timezone.now()
+        account = AccountFactory(start_date=now, end_date=now + datetime.timedelta(days=1))
+        self.assertNotIn(account, Account.objects.active(now - datetime.timedelta(days=1)))
+        self.assertIn(account, Account.objects.active(now))
+        self.assertIn(account, Account.objects.expired(now + datetime.timedelta(days=2)))
+
+
+class TestANewTransfer(TestCase):
+
+    def setUp(self):
+        self.transfer = Transfer(source=AccountFactory(), destination=AccountFactory(),
+                                 amount=D('10.00'))
+
+    def test_is_saved_with_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.transfer.save()
+
+    def test_is_given_a_reference_that_matches_the_url_patterns(self):
+        self.transfer.save()
+        self.assertRegex(self.transfer.reference, r'^[A-Z0-9]{32}$')
+
+
+class TestAnnotatingWhetherAccountsAreActive(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        self.open_ended = AccountFactory()
+        self.current = AccountFactory(start_date=now - datetime.timedelta(days=1),
+                                      end_date=now + datetime.timedelta(days=1))
+        self.expired = AccountFactory(end_date=now - datetime.timedelta(days=1))
+        self.future = AccountFactory(start_date=now + datetime.timedelta(days=1))
+
+    def test_matches_is_active(self):
+        for account in Account.objects.annotate_is_active():
+            self.assertEqual(account.is_active(timezone.now()), account.is_active_now)
+
+    def test_can_be_filtered_on(self):
+        accounts = Account.objects.annotate_is_active().filter(is_active_now=True)
+        self.assertEqual({self.open_ended, self.current}, set(accounts))
+
 
 class TestATransaction(TestCase):
 
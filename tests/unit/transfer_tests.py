@@ -1,11 +1,13 @@
 from decimal import Decimal as D
+from unittest import mock
 
-from django.test import TestCase
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 from oscar.test.factories import UserFactory
 
-from oscar_accounts import exceptions
-from oscar_accounts.models import Transfer
+from oscar_accounts import exceptions, signals
+from oscar_accounts.models import Account, Transfer
 from oscar_accounts.test_factories import AccountFactory
 
 
@@ -34,6 +36,21 @@ class TestASuccessfulTransfer(TestCase):
         with self.assertRaises(RuntimeError):
             self.transfer.delete()
 
+    def test_persists_the_updated_balances(self):
+        source = Account.objects.get(id=self.transfer.source.id)
+        destination = Account.objects.get(id=self.transfer.destination.id)
+        self.assertEqual(-D('10.00'), source.balance)
+        self.assertEqual(D('10.00'), destination.balance)
+
+    def test_does_not_recalculate_balances_from_transactions(self):
+        source = AccountFactory(primary_user=None, credit_limit=None)
+        destination = AccountFactory()
+        with mock.patch.object(Account, '_balance') as mock_balance:
+            Transfer.objects.create(source, destination, D('5.00'))
+        self.assertFalse(mock_balance.called)
+        self.assertEqual(-D('5.00'), source.balance)
+        self.assertEqual(D('5.00'), destination.balance)
+
     def test_records_static_user_information_in_case_user_is_deleted(self):
         self.assertEqual('barry', self.transfer.authorisor_username)
         self.user.delete()
@@ -41,6 +58,85 @@ class TestASuccessfulTransfer(TestCase):
         self.assertEqual('barry', transfer.authorisor_username)
 
 
+class TestATransferFromAStaleAccountInstance(TestCase):
+
+    def test_uses_the_current_balance(self):
+        source = AccountFactory(primary_user=None, credit_limit=D('0.00'))
+        destination = AccountFactory()
+        bank = AccountFactory(primary_user=None, credit_limit=None)
+        Transfer.objects.create(bank, Account.objects.get(id=source.id), D('20.00'))
+
+        # The source instance still has a zero balance in memory
+        Transfer.objects.create(source, destination, D('15.00'))
+        self.assertEqual(D('5.00'), source.balance)
+        self.assertEqual(D('5.00'), Account.objects.get(id=source.id).balance)
+
+
+class TestATransferBetweenAccountIDs(TestCase):
+
+    def setUp(self):
+        self.source = AccountFactory(primary_user=None, credit_limit=None)
+        self.destination = AccountFactory()
+
+    def test_updates_both_balances(self):
+        transfer = Transfer.objects.create_by_id(
+            self.source.id, self.destination.id, D('10.00'))
+        self.assertEqual(2, transfer.transactions.all().count())
+        self.assertEqual(-D('10.00'), Account.objects.get(id=self.source.id).balance)
+        self.assertEqual(D('10.00'), Account.objects.get(id=self.destination.id).balance)
+
+    def test_verifies_the_transfer(self):
+        self.destination.close()
+        with self.assertRaises(exceptions.ClosedAccount):
+            Transfer.objects.create_by_id(
+                self.source.id, self.destination.id, D('10.00'))
+
+    def test_raises_an_exception_for_a_missing_account(self):
+        with self.assertRaises(Account.DoesNotExist):
+            Transfer.objects.create_by_id(
+                self.source.id, self.destination.id + 1, D('10.00'))
+
+    def test_accepts_ids_passed_as_strings(self):
+        Transfer.objects.create_by_id(
+            str(self.source.id), str(self.destination.id), D('10.00'))
+        self.assertEqual(D('10.00'), Account.objects.get(id=self.destination.id).balance)
+
+    def test_rejects_the_same_account_as_source_and_destination(self):
+        with self.assertRaises(exceptions.AccountException) as cm:
+            Transfer.objects.create_by_id(
+                self.source.id, self.source.id, D('10.00'))
+        self.assertNotIsInstance(cm.exception, exceptions.InsufficientFunds)
+        self.assertEqual(0, Transfer.objects.count())
+
+    def test_rejects_the_same_account_instance_as_source_and_destination(self):
+        with self.assertRaises(exceptions.AccountException) as cm:
+            Transfer.objects.create(self.source, self.source, D('10.00'))
+        self.assertNotIsInstance(cm.exception, exceptions.InsufficientFunds)
+
+
+class TestATrustedTransfer(TestCase):
+
+    def setUp(self):
+        self.source = AccountFactory(primary_user=None, credit_limit=None)
+        self.destination = AccountFactory()
+
+    def test_updates_both_balances(self):
+        Transfer.objects.create_trusted(self.source, self.destination, D('10.00'))
+        self.assertEqual(-D('10.00'), self.source.balance)
+        self.assertEqual(D('10.00'), self.destination.balance)
+
+    def test_still_verifies_the_accounts(self):
+        self.destination.close()
+        with self.assertRaises(exceptions.ClosedAccount):
+            Transfer.objects.create_trusted(self.source, self.destination, D('10.00'))
+
+    def test_cannot_be_made_for_a_non_positive_amount(self):
+        for amount in (D('0.00'), D('-10.00')):
+            with self.assertRaises(IntegrityError):
+                Transfer.objects.create_trusted(self.source, self.destination, amount)
+        self.assertEqual(0, Transfer.objects.all().count())
+
+
 class TestATransferToAnInactiveAccount(TestCase):
 
     def test_is_permitted(self):
@@ -83,6 +179,15 @@ class TestAnAttemptedTransfer(TestCase):
             Transfer.objects.create(source, destination,
                                     D('20.00'), user=self.user)
 
+    def test_does_not_debit_beyond_the_credit_limit_if_verification_is_bypassed(self):
+        source = AccountFactory(primary_user=None, credit_limit=D('10.00'))
+        destination = AccountFactory()
+        with mock.patch.object(Transfer.objects, 'verify_transfer'):
+            with self.assertRaises(exceptions.InsufficientFunds):
+                Transfer.objects.create(source, destination, D('20.00'))
+        self.assertEqual(0, Transfer.objects.all().count())
+        self.assertEqual(D('0.00'), Account.objects.get(id=source.id).balance)
+
     def test_raises_an_exception_when_trying_to_debit_negative_value(self):
         source = AccountFactory(credit_limit=None)
         destination = AccountFactory()
@@ -105,3 +210,27 @@ class TestAnAttemptedTransfer(TestCase):
         with self.assertRaises(exceptions.ClosedAccount):
             Transfer.objects.create(
                 source, destination, D('20.00'), user=self.user)
+
+
+class TestTransferPostedSignal(TransactionTestCase):
+
+    def setUp(self):
+        self.source = AccountFactory(primary_user=None, credit_limit=None)
+        self.destination = AccountFactory()
+        self.receiver = mock.Mock()
+        signals.transfer_posted.connect(self.receiver)
+
+    def tearDown(self):
+        signals.transfer_posted.disconnect(self.receiver)
+
+    def test_is_sent_once_the_transfer_is_committed(self):
+        transfer = Transfer.objects.create(self.source, self.destination, D('10.00'))
+        self.receiver.assert_called_once_with(
+            signal=signals.transfer_posted, sender=Transfer, transfer=transfer)
+
+    def test_is_not_sent_when_the_transfer_is_rolled_back(self):
+        with mock.patch('oscar_accounts.abstract_models.PostingManager._wrap') as mock_method:
+            mock_method.side_effect = RuntimeError()
+            with self.assertRaises(RuntimeError):
+                Transfer.objects.create(self.source, self.destination, D('10.00'))
+        self.assertFalse(self.receiver.called)